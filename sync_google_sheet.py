@@ -10,15 +10,27 @@ Usage:
     python sync_google_sheet.py
     python sync_google_sheet.py --skip-download
     python sync_google_sheet.py --spreadsheet-id <ID> --gid <GID>
+    python sync_google_sheet.py --ndjson
 """
 import urllib.request
 import urllib.error
+import http.client
 import csv
 import json
+import io
+import os
 import sys
 import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Optional: orjson encodes JSON strings faster than the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Default Google Sheets configuration
 DEFAULT_SPREADSHEET_ID = "1BsTCewXvYLHTEatDZbPTgQOyu0fQf9BowmycI8dI25k"
 DEFAULT_GID = "1432562920"
@@ -40,6 +52,101 @@ REQUIRED_COLUMNS = [
     'Image',
 ]
 
+# Gem attributes in output order: (trait type, CSV-derived field)
+GEM_ATTRIBUTES = (
+    ('Category', 'category'),
+    ('Gem', 'gem'),
+    ('Code', 'code'),
+    ('Cut', 'cut'),
+    ('Tier', 'tier'),
+)
+
+# File name of the NDJSON output (one gem per line)
+NDJSON_FILENAME = "gems.ndjson"
+
+# Chunk size used when streaming the CSV download to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Validators of the last converted download, used for conditional requests
+LAST_MODIFIED_FILENAME = ".last_modified"
+
+# Returned by download_csv when the sheet has not changed since the last download
+NOT_MODIFIED = object()
+
+# Number of threads used to write JSON files concurrently
+WRITE_WORKERS = 16
+
+
+def build_export_url(spreadsheet_id, gid):
+    """
+    Build the CSV export URL of a Google Sheets tab
+    
+    Args:
+        spreadsheet_id: Google Sheets spreadsheet ID
+        gid: Google Sheets tab GID
+    
+    Returns:
+        Export URL string
+    """
+    return (
+        f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?"
+        f"format=csv&gid={gid}"
+    )
+
+
+def load_validators(csv_file, export_url):
+    """
+    Load the cache validators stored with a previously downloaded CSV
+    
+    Args:
+        csv_file: Path to the downloaded CSV file
+        export_url: URL the CSV is downloaded from
+    
+    Returns:
+        Dict with 'last_modified' and 'etag' entries (empty if not usable)
+    """
+    csv_file = Path(csv_file)
+    if not csv_file.exists():
+        return {}
+    
+    try:
+        with open(csv_file.parent / LAST_MODIFIED_FILENAME, 'r', encoding='utf-8') as f:
+            validators = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    # Validators only apply to the same sheet
+    if not isinstance(validators, dict) or validators.get('url') != export_url:
+        return {}
+    
+    return validators
+
+
+def save_validators(csv_file, validators):
+    """
+    Save the cache validators of a CSV once its output has been generated
+    
+    Args:
+        csv_file: Path to the downloaded CSV file
+        validators: Dict with 'url', 'last_modified' and 'etag' entries
+    """
+    validators_file = Path(csv_file).parent / LAST_MODIFIED_FILENAME
+    
+    if not validators.get('last_modified') and not validators.get('etag'):
+        validators_file.unlink(missing_ok=True)
+        return
+    
+    with open(validators_file, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'url': validators['url'],
+                'last_modified': validators.get('last_modified'),
+                'etag': validators.get('etag'),
+            },
+            f,
+            indent=4
+        )
+
 
 def download_csv(spreadsheet_id, gid, output_file):
     """
@@ -51,13 +158,14 @@ def download_csv(spreadsheet_id, gid, output_file):
         output_file: Path to save the CSV file
     
     Returns:
-        True if successful, False otherwise
+        Tuple (content, validators). content is the downloaded CSV as bytes,
+        NOT_MODIFIED if the sheet is unchanged since the last download, or
+        None on failure. validators holds the cache headers of a fresh
+        download whose size was verified (None otherwise); they are saved
+        by the caller once the CSV has been converted.
     """
     # Construct the export URL
-    export_url = (
-        f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?"
-        f"format=csv&gid={gid}"
-    )
+    export_url = build_export_url(spreadsheet_id, gid)
     
     print(f"📥 Downloading CSV from Google Sheets...")
     print(f"   URL: {export_url}")
@@ -71,52 +179,104 @@ def download_csv(spreadsheet_id, gid, output_file):
             }
         )
         
-        # Download the file
-        with urllib.request.urlopen(req) as response:
-            data = response.read()
-            
-            # Ensure output directory exists
-            output_file = Path(output_file)
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Write to file
-            with open(output_file, 'wb') as f:
-                f.write(data)
-            
-            # Get file size
-            file_size = len(data)
-            print(f"✓ Successfully downloaded CSV file")
-            print(f"  Saved to: {output_file}")
-            print(f"  File size: {file_size:,} bytes")
-            
-            # Count lines
-            with open(output_file, 'r', encoding='utf-8') as f:
-                line_count = sum(1 for _ in f)
-            print(f"  Total lines: {line_count}\n")
-            
-            return True
+        # Ensure output directory exists
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Ask the server to skip the body if the sheet has not changed
+        validators = load_validators(output_file, export_url)
+        if validators.get('last_modified'):
+            req.add_header('If-Modified-Since', validators['last_modified'])
+        if validators.get('etag'):
+            req.add_header('If-None-Match', validators['etag'])
+        
+        # Stream to a temporary file so a failed download keeps the old CSV,
+        # keeping the chunks in memory and counting lines as they arrive
+        part_file = output_file.with_name(output_file.name + '.part')
+        chunks = []
+        file_size = 0
+        line_count = 0
+        last_byte = b''
+        try:
+            with urllib.request.urlopen(req) as response, open(part_file, 'wb') as f:
+                while True:
+                    chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    chunks.append(chunk)
+                    file_size += len(chunk)
+                    line_count += chunk.count(b'\n')
+                    last_byte = chunk[-1:]
+                headers = response.headers
+                
+                # read() returns b'' if the connection drops early, so check
+                # the size against Content-Length before trusting the file
+                content_length = headers.get('Content-Length')
+                expected_size = (
+                    int(content_length) if content_length and content_length.isdigit()
+                    else None
+                )
+                if getattr(response, 'length', None) or (
+                    expected_size is not None and file_size != expected_size
+                ):
+                    raise http.client.IncompleteRead(
+                        b''.join(chunks),
+                        expected_size - file_size if expected_size is not None else None
+                    )
+            part_file.replace(output_file)
             
+            # Reached only once the size check above has passed
+            validators = {
+                'url': export_url,
+                'last_modified': headers.get('Last-Modified'),
+                'etag': headers.get('ETag'),
+            }
+        except BaseException:
+            # Don't leave a partial download next to the CSV
+            part_file.unlink(missing_ok=True)
+            raise
+        
+        # Count a final line without a trailing newline
+        if last_byte and last_byte != b'\n':
+            line_count += 1
+        
+        print(f"✓ Successfully downloaded CSV file")
+        print(f"  Saved to: {output_file}")
+        print(f"  File size: {file_size:,} bytes")
+        print(f"  Total lines: {line_count}\n")
+        
+        return b''.join(chunks), validators
+        
     except urllib.error.HTTPError as e:
+        if e.code == 304:
+            print(f"✓ CSV unchanged since last download")
+            print(f"  Using existing file: {output_file}\n")
+            return NOT_MODIFIED, None
+        
         print(f"✗ HTTP Error: {e.code} - {e.reason}")
         if e.code == 403:
             print("  This might be because the sheet is not publicly accessible.")
             print("  Please make sure the Google Sheet is shared with 'Anyone with the link' can view.")
-        return False
+        return None, None
         
     except urllib.error.URLError as e:
         print(f"✗ URL Error: {e.reason}")
         print("  Please check your internet connection.")
-        return False
+        return None, None
         
     except Exception as e:
         print(f"✗ Error: {str(e)}")
-        return False
+        return None, None
 
 
+@functools.lru_cache(maxsize=None)
 def generate_description(cut, color):
     """
     Generate description based on cut and color
     
+    Results are cached, since only a few cut and color pairs occur.
+    
     Args:
         cut: Cut type (e.g., "Brilliant", "Princess")
         color: Color name (e.g., "Ruby", "Emerald")
@@ -133,13 +293,129 @@ def generate_description(cut, color):
     return f"A unique {cut_display} cut gemstone in {color} color."
 
 
-def csv_to_json(csv_file, output_dir):
+def json_bytes(value):
+    """
+    Encode a string as a UTF-8 JSON string literal
+    
+    Uses orjson when installed, otherwise the standard library. Both keep
+    non-ASCII characters as-is and produce the same output.
+    
+    Args:
+        value: String to encode
+    
+    Returns:
+        JSON string literal as bytes, including the surrounding quotes
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def build_gem_encoder(with_id=False, suffix='', **dumps_kwargs):
+    """
+    Build an encoder specialized for the fixed layout of a gem document
+    
+    The document structure is laid out once by json.dumps with a %s slot
+    for every value, so encoding a gem only escapes the values and fills
+    the slots. The result is the same as json.dumps on the whole document.
+    
+    Args:
+        with_id: If True, include the gem ID as the first field
+        suffix: Text appended after the document (e.g. a newline)
+        **dumps_kwargs: Layout options passed to json.dumps (indent, separators)
+    
+    Returns:
+        Function taking (gem_id, name, description, category, gem, code,
+        cut, tier, image) strings and returning the document as bytes
+    """
+    # Placeholders cannot clash with the fixed keys and trait types
+    def slot(field):
+        return '\0' + field
+    
+    document = {}
+    if with_id:
+        document['id'] = slot('id')
+    document['name'] = slot('name')
+    document['description'] = slot('description')
+    document['attributes'] = [
+        {'trait_type': trait_type, 'value': slot(field)}
+        for trait_type, field in GEM_ATTRIBUTES
+    ]
+    document['image'] = slot('image')
+    
+    layout = json.dumps(document, ensure_ascii=False, **dumps_kwargs) + suffix
+    layout = layout.replace('%', '%%')
+    fields = ['id', 'name', 'description', *(field for _, field in GEM_ATTRIBUTES), 'image']
+    for field in fields:
+        layout = layout.replace(json.dumps(slot(field)), '%s')
+    template = layout.encode('utf-8')
+    
+    # Slots are in document order, which matches the argument order
+    first = 0 if with_id else 1
+    
+    def encode(*values):
+        return template % tuple(map(json_bytes, values[first:]))
+    
+    return encode
+
+
+# Encoders for a gem JSON file (indent=4) and a single NDJSON line
+encode_gem_json = build_gem_encoder(indent=4)
+encode_gem_ndjson = build_gem_encoder(with_id=True, suffix='\n', separators=(',', ':'))
+
+
+def write_file_bytes(path, data):
+    """
+    Write bytes to a file using low-level OS calls
+    
+    Skips the buffered file object that open() would create for each file.
+    
+    Args:
+        path: Path of the file to write
+        data: Bytes to write
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(path, flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+def write_file_if_changed(path, data):
+    """
+    Write bytes to a file unless it already has exactly that content
+    
+    Args:
+        path: Path of the file to write
+        data: Bytes to write
+    
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(data) + 1) == data:
+                return False
+    except OSError:
+        pass
+    
+    write_file_bytes(path, data)
+    return True
+
+
+def csv_to_json(csv_file, output_dir, data_bytes=None, ndjson=False):
     """
     Convert CSV data to JSON metadata files
     
     Args:
         csv_file: Path to CSV file
         output_dir: Directory to save JSON files
+        data_bytes: CSV content already in memory (csv_file is not read if given)
+        ndjson: If True, write all gems to a single NDJSON file instead
     
     Returns:
         True if successful, False otherwise
@@ -150,7 +426,7 @@ def csv_to_json(csv_file, output_dir):
     # Ensure output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    if not csv_file.exists():
+    if data_bytes is None and not csv_file.exists():
         print(f"✗ CSV file not found: {csv_file}")
         return False
     
@@ -160,89 +436,133 @@ def csv_to_json(csv_file, output_dir):
     print(f"   Using only required columns: {', '.join(REQUIRED_COLUMNS)}")
     
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        # Parse the downloaded content directly instead of re-reading it from disk
+        if data_bytes is not None:
+            csv_stream = io.StringIO(data_bytes.decode('utf-8'))
+        else:
+            csv_stream = open(csv_file, 'r', encoding='utf-8', newline='')
+        
+        with csv_stream as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            
+            # Check the header once so schema changes fail fast
+            missing = [name for name in REQUIRED_COLUMNS if name not in header]
+            if missing:
+                print(f"✗ CSV is missing required columns: {', '.join(missing)}")
+                return False
+            
+            # Resolve required column positions once, extra columns will be ignored
+            column_index = [header.index(name) for name in REQUIRED_COLUMNS]
+            id_idx = column_index[0]
+            max_idx = max(column_index)
             
-            # Only process required columns, extra columns will be ignored
             processed_count = 0
             skipped_count = 0
+            unchanged_count = 0
+            
+            # Encoded content per gem; a repeated ID keeps its last row
+            gems = {}
+            
+            # Collected and printed together after the loop
+            skip_messages = []
+            
+            # Build output paths by string concatenation rather than Path joins
+            output_prefix = os.fspath(output_dir) + os.sep
+            
+            encode_gem = encode_gem_ndjson if ndjson else encode_gem_json
             
             for row in reader:
                 # Skip empty rows
-                if not row.get('ID') or not row.get('ID').strip():
+                if len(row) <= id_idx or not row[id_idx].strip():
+                    continue
+                
+                if len(row) <= max_idx:
+                    skip_messages.append(
+                        f"⚠ Skipping row {row[id_idx].strip()}: Missing required fields"
+                    )
+                    skipped_count += 1
                     continue
                 
                 try:
-                    gem_id = row.get('ID', '').strip()
-                    code = row.get('Code', '').strip()
-                    name = row.get('Name', '').strip()
-                    category = row.get('Category', '').strip()
-                    gem = row.get('Gem', '').strip()
-                    cut = row.get('Cut', '').strip()
-                    tier = row.get('Tier', '').strip()
-                    image = row.get('Image', '').strip()
+                    # Pick the required columns in REQUIRED_COLUMNS order
+                    (
+                        gem_id, code, name, category, gem, cut, tier, image
+                    ) = [row[i].strip() for i in column_index]
                     
-                    if not all([code, name, category, gem, cut, tier, image]):
-                        print(f"⚠ Skipping row {gem_id}: Missing required fields")
+                    if not (code and name and category and gem and cut and tier and image):
+                        skip_messages.append(f"⚠ Skipping row {gem_id}: Missing required fields")
                         skipped_count += 1
                         continue
                     
                     description = generate_description(cut, gem)
                     
-                    json_data = {
-                        "name": name,
-                        "description": description,
-                        "attributes": [
-                            {
-                                "trait_type": "Category",
-                                "value": category
-                            },
-                            {
-                                "trait_type": "Gem",
-                                "value": gem
-                            },
-                            {
-                                "trait_type": "Code",
-                                "value": code
-                            },
-                            {
-                                "trait_type": "Cut",
-                                "value": cut
-                            },
-                            {
-                                "trait_type": "Tier",
-                                "value": tier
-                            }
-                        ],
-                        "image": image
-                    }
+                    gems[gem_id] = encode_gem(
+                        gem_id, name, description, category, gem, code, cut, tier, image
+                    )
+                
+                except Exception as e:
+                    skip_messages.append(f"⚠ Error processing row {gem_id}: {str(e)}")
+                    skipped_count += 1
+                    continue
+            
+        # One write per gem, so no two threads ever write the same file.
+        # Files already holding the same bytes are left untouched.
+        if not ndjson:
+            with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+                futures = [
+                    (gem_id, executor.submit(
+                        write_file_if_changed, output_prefix + gem_id + '.json', data
+                    ))
+                    for gem_id, data in gems.items()
+                ]
+                
+                # Wait for the writes in row order
+                for gem_id, future in futures:
+                    try:
+                        written = future.result()
+                    except Exception as e:
+                        skip_messages.append(f"⚠ Error writing file for row {gem_id}: {str(e)}")
+                        skipped_count += 1
+                        continue
                     
-                    # Write JSON file
-                    output_file = output_dir / f"{gem_id}.json"
-                    with open(output_file, 'w', encoding='utf-8') as json_file:
-                        json.dump(json_data, json_file, indent=4, ensure_ascii=False)
+                    if not written:
+                        unchanged_count += 1
+                        continue
                     
                     processed_count += 1
                     
                     if processed_count % 50 == 0:
                         print(f"  Processed {processed_count} files...")
-                
-                except KeyError as e:
-                    print(f"⚠ Skipping row: Missing column '{e}'")
-                    skipped_count += 1
-                    continue
-                except Exception as e:
-                    print(f"⚠ Error processing row {row.get('ID', 'unknown')}: {str(e)}")
-                    skipped_count += 1
-                    continue
-            
-            print(f"\n✓ Successfully generated {processed_count} JSON files")
-            if skipped_count > 0:
-                print(f"⚠ Skipped {skipped_count} rows")
-            print(f"  Output directory: {output_dir}")
+        
+        if skip_messages:
+            sys.stdout.write('\n'.join(skip_messages) + '\n')
+        
+        if ndjson:
+            ndjson_file = output_prefix + NDJSON_FILENAME
             
-            return True
+            # Write to a temporary file so an interrupted write keeps the old file
+            part_file = ndjson_file + '.part'
+            try:
+                write_file_bytes(part_file, b''.join(gems.values()))
+                os.replace(part_file, ndjson_file)
+            except Exception as e:
+                print(f"✗ Error writing NDJSON file {ndjson_file}: {str(e)}")
+                return False
+            finally:
+                Path(part_file).unlink(missing_ok=True)
             
+            print(f"\n✓ Successfully wrote {len(gems)} gems to {ndjson_file}")
+        else:
+            print(f"\n✓ Successfully generated {processed_count} JSON files")
+        if unchanged_count > 0:
+            print(f"⏭ Skipped {unchanged_count} unchanged files")
+        if skipped_count > 0:
+            print(f"⚠ Skipped {skipped_count} rows")
+        print(f"  Output directory: {output_dir}")
+        
+        return True
+        
     except Exception as e:
         print(f"✗ Error reading CSV file: {str(e)}")
         return False
@@ -253,7 +573,8 @@ def sync_google_sheet(
     gid,
     csv_file,
     json_output_dir,
-    skip_download=False
+    skip_download=False,
+    ndjson=False
 ):
     """
     Sync Google Sheets data: download CSV and generate JSON files
@@ -264,6 +585,7 @@ def sync_google_sheet(
         csv_file: Path to save/read CSV file
         json_output_dir: Directory to save JSON files
         skip_download: If True, skip downloading and use existing CSV
+        ndjson: If True, write a single NDJSON file instead of one file per gem
     
     Returns:
         True if successful, False otherwise
@@ -273,12 +595,17 @@ def sync_google_sheet(
     print("=" * 60)
     print()
     
+    csv_data = None
+    validators = None
+    
     # Step 1: Download CSV (unless skipped)
     if not skip_download:
-        success = download_csv(spreadsheet_id, gid, csv_file)
-        if not success:
+        result, validators = download_csv(spreadsheet_id, gid, csv_file)
+        if result is None:
             print("\n✗ Failed to download CSV. Aborting.")
             return False
+        if result is not NOT_MODIFIED:
+            csv_data = result
     else:
         csv_path = Path(csv_file)
         if not csv_path.exists():
@@ -287,12 +614,23 @@ def sync_google_sheet(
             return False
         print(f"⏭ Skipping download, using existing CSV: {csv_file}\n")
     
-    # Step 2: Convert CSV to JSON
-    success = csv_to_json(csv_file, json_output_dir)
+    # Step 2: Convert CSV to JSON (also when the sheet is unchanged, so
+    # missing or modified output files are restored; unchanged files are
+    # not rewritten)
+    success = csv_to_json(
+        csv_file,
+        json_output_dir,
+        data_bytes=csv_data,
+        ndjson=ndjson
+    )
     if not success:
         print("\n✗ Failed to generate JSON files.")
         return False
     
+    # Only record the sheet as synced once its output exists
+    if validators:
+        save_validators(csv_file, validators)
+    
     print()
     print("=" * 60)
     print("✅ Sync completed successfully!")
@@ -312,6 +650,7 @@ Examples:
   python sync_google_sheet.py --skip-download
   python sync_google_sheet.py --spreadsheet-id <ID> --gid <GID>
   python sync_google_sheet.py --csv ./custom.csv --output ./custom_json
+  python sync_google_sheet.py --ndjson
         """
     )
     
@@ -345,6 +684,12 @@ Examples:
         help='Skip downloading CSV and use existing file'
     )
     
+    parser.add_argument(
+        '--ndjson',
+        action='store_true',
+        help=f'Write all gems to a single {NDJSON_FILENAME} file (one JSON object per line)'
+    )
+    
     args = parser.parse_args()
     
     success = sync_google_sheet(
@@ -352,7 +697,8 @@ Examples:
         gid=args.gid,
         csv_file=args.csv,
         json_output_dir=args.output,
-        skip_download=args.skip_download
+        skip_download=args.skip_download,
+        ndjson=args.ndjson
     )
     
     sys.exit(0 if success else 1)